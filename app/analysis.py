@@ -2,21 +2,56 @@ from __future__ import annotations
 
 import threading
 import time
-from typing import Optional, Tuple
+from typing import Callable, Optional, Tuple
 
 import numpy as np
+import scipy.fft as sfft
+
+try:
+    import pyfftw
+    import pyfftw.builders
+except Exception:
+    pyfftw = None
 
 from .audio_engine import AudioEngine
+from .state import StateStore
+from .dsp import apply_window, downmix_mono, magnitude_smooth
 
 
 def hann_window(n: int) -> np.ndarray:
-    return np.hanning(n).astype(np.float32)
+    if n <= 1:
+        return np.ones(max(0, n), dtype=np.float32)
+    k = np.arange(n, dtype=np.float32)
+    return (0.5 - 0.5 * np.cos(k * np.float32(2.0 * np.pi / (n - 1)))).astype(np.float32, copy=False)
+
+
+def make_rfft(n: int) -> Tuple[np.ndarray, Callable[[], np.ndarray]]:
+    if pyfftw is not None:
+        try:
+            plan = pyfftw.builders.rfft(pyfftw.empty_aligned(n, dtype="float32"), n=n, threads=1,
+                                        planner_effort="FFTW_MEASURE")
+            return plan.input_array, plan
+        except Exception:
+            pass
+    buf = np.empty(n, dtype=np.float32)
+    return buf, lambda: sfft.rfft(buf, n=n, overwrite_x=True)
+
+
+def _copy_into(dst: np.ndarray, src: np.ndarray) -> np.ndarray:
+    if dst.shape != src.shape:
+        return src.astype(np.float32, copy=True)
+    np.copyto(dst, src)
+    return dst
+
+
+IDLE_FPS = 5
 
 
 class Analyzer:
-    def __init__(self, audio: AudioEngine) -> None:
+    def __init__(self, audio: AudioEngine, state: Optional[StateStore] = None) -> None:
         self.audio = audio
-        self._lock = threading.RLock()
+        self.state = state
+        self._lock = threading.Lock()
         self._stop = threading.Event()
         self._thread: Optional[threading.Thread] = None
 
@@ -31,22 +66,39 @@ class Analyzer:
 
         self.time_domain: np.ndarray = np.zeros((1024, 1), dtype=np.float32)
         self.spectrum: np.ndarray = np.zeros((1025,), dtype=np.float32)
-        self.rms: list[float] = [0.0]
-        self.peak: list[float] = [0.0]
+        self.rms: np.ndarray = np.zeros(1, dtype=np.float32)
+        self.peak: np.ndarray = np.zeros(1, dtype=np.float32)
         self.corr: Optional[float] = None
 
+        # _run fills the inactive slot, then flips _latest_idx.
+        self._bufs = [
+            dict(frame_id=0, ts=0.0, td=self.time_domain.copy(), spec=self.spectrum.copy(),
+                 rms=np.zeros(2, dtype=np.float32), peak=np.zeros(2, dtype=np.float32), corr=None)
+            for _ in range(2)
+        ]
+        self._latest_idx = 0
+
         self._win = hann_window(self.fft_size)
-        self._prev_spec: Optional[np.ndarray] = None
+        self._xw: Optional[np.ndarray] = None
+        self._fft: Optional[Callable[[], np.ndarray]] = None
+        self._mono = np.empty(self.fft_size, dtype=np.float32)
+        self._spec = np.zeros(self.fft_size // 2 + 1, dtype=np.float32)
+        self._spec_primed = False
+        self._centered = np.empty((1024, 2), dtype=np.float32)
 
     def configure(self, *, samplerate: int, channels: int, fft_size: int, fps_cap: int, smoothing: float) -> None:
         with self._lock:
             self.samplerate = int(samplerate)
             self.channels = 1 if int(channels) <= 1 else 2
+            if int(fft_size) != self.fft_size:
+                self._xw, self._fft = None, None
             self.fft_size = int(fft_size)
             self.fps_cap = int(fps_cap)
             self.smoothing = float(smoothing)
             self._win = hann_window(self.fft_size)
-            self._prev_spec = None
+            self._mono = np.empty(self.fft_size, dtype=np.float32)
+            self._spec = np.zeros(self.fft_size // 2 + 1, dtype=np.float32)
+            self._spec_primed = False
 
     def start(self) -> None:
         if self._thread and self._thread.is_alive():
@@ -60,32 +112,45 @@ class Analyzer:
         if self._thread:
             self._thread.join(timeout=timeout)
 
-    def get_latest(self) -> Tuple[int, float, np.ndarray, np.ndarray, list[float], list[float], Optional[float]]:
+    def latest_frame_id(self) -> int:
+        return self._bufs[self._latest_idx]["frame_id"]
+
+    def get_latest(self) -> Tuple[int, float, np.ndarray, np.ndarray, np.ndarray, np.ndarray, Optional[float]]:
+        # No copy: the slot may be rewritten from the next frame on; check frame_intact() after use.
+        b = self._bufs[self._latest_idx]
+        ch = b["td"].shape[1]
+        return (b["frame_id"], b["ts"], b["td"], b["spec"], b["rms"][:ch], b["peak"][:ch], b["corr"])
+
+    def frame_intact(self, frame_id: int) -> bool:
+        return frame_id > 0 and any(b["frame_id"] == frame_id for b in self._bufs)
+
+    def _ensure_plan(self) -> None:
+        with self._lock:
+            fft_size = self.fft_size
+        xw, fft = make_rfft(fft_size)
         with self._lock:
-            return (
-                int(self.frame_id),
-                float(self.ts),
-                self.time_domain.copy(),
-                self.spectrum.copy(),
-                list(self.rms),
-                list(self.peak),
-                self.corr,
-            )
+            if self.fft_size == fft_size:
+                self._xw, self._fft = xw, fft
 
     def _compute_corr(self, x: np.ndarray) -> Optional[float]:
         if x.shape[1] < 2:
             return None
-        l = x[:, 0] - float(np.mean(x[:, 0]))
-        r = x[:, 1] - float(np.mean(x[:, 1]))
-        denom = float(np.sqrt(np.sum(l*l) * np.sum(r*r)))
+        x = x[:, :2]
+        if self._centered.shape != x.shape:
+            self._centered = np.empty(x.shape, dtype=np.float32)
+        xc = np.subtract(x, x.mean(axis=0), out=self._centered)
+        # 2x2 Gram matrix: [[sum(l*l), sum(l*r)], [sum(l*r), sum(r*r)]]
+        g = np.einsum("ij,ik->jk", xc, xc)
+        denom = float(np.sqrt(g[0, 0] * g[1, 1]))
         if denom <= 1e-12:
             return None
-        return float(np.sum(l*r) / denom)
+        return float(g[0, 1] / denom)
 
     def _run(self) -> None:
         td_len = 1024
+        td_mono = np.empty(td_len, dtype=np.float32)
         while not self._stop.is_set():
-            t0 = time.time()
+            t0 = time.perf_counter()
             ring = self.audio.ring
             if ring is None:
                 time.sleep(0.05)
@@ -96,14 +161,27 @@ class Analyzer:
                 fps_cap = self.fps_cap
                 smoothing = self.smoothing
                 win = self._win
+                xw = self._xw
+                fft = self._fft
+                mono = self._mono
+                spec = self._spec
+                need_plan = fft is None or xw is None
+                if not need_plan and not self._spec_primed:
+                    smoothing = 0.0
+                    self._spec_primed = True
+            if need_plan:
+                self._ensure_plan()
+                continue
 
             x_fft = ring.read_latest(fft_size)
             x_td = ring.read_latest(td_len)
 
             if x_fft.shape[1] != self.channels:
                 if self.channels == 1:
-                    x_fft = np.mean(x_fft, axis=1, keepdims=True)
-                    x_td = np.mean(x_td, axis=1, keepdims=True)
+                    downmix_mono(x_fft, mono)
+                    downmix_mono(x_td, td_mono)
+                    x_fft = mono[:, None]
+                    x_td = td_mono[:, None]
                 else:
                     if x_fft.shape[1] == 1:
                         x_fft = np.repeat(x_fft, 2, axis=1)
@@ -112,37 +190,50 @@ class Analyzer:
                         x_fft = x_fft[:, :self.channels]
                         x_td = x_td[:, :self.channels]
 
-            rms = []
-            peak = []
-            for c in range(x_td.shape[1]):
-                xc = x_td[:, c]
-                rms.append(float(np.sqrt(np.mean(xc * xc) + 1e-12)))
-                peak.append(float(np.max(np.abs(xc)) + 1e-12))
+            slot = self._bufs[1 - self._latest_idx]
+            slot["frame_id"] = -1
+            n_td, n_ch = x_td.shape
+            rms = slot["rms"][:n_ch]
+            peak = slot["peak"][:n_ch]
+            np.einsum("ij,ij->j", x_td, x_td, out=rms)
+            rms *= 1.0 / n_td
+            rms += 1e-12
+            np.sqrt(rms, out=rms)
+            np.max(np.abs(x_td), axis=0, out=peak)
+            peak += 1e-12
 
             corr = self._compute_corr(x_td) if self.channels == 2 else None
 
-            x_mono = x_fft[:, 0] if x_fft.shape[1] == 1 else np.mean(x_fft, axis=1)
-            xw = x_mono * win
-            spec = np.abs(np.fft.rfft(xw)).astype(np.float32)
-            spec /= max(1.0, float(fft_size) / 2.0)
-
-            if self._prev_spec is None or smoothing <= 0:
-                sm = spec
+            if x_fft.shape[1] == 1:
+                x_mono = x_fft[:, 0]
             else:
-                sm = (smoothing * self._prev_spec + (1.0 - smoothing) * spec).astype(np.float32)
-            self._prev_spec = sm
+                downmix_mono(x_fft, mono)
+                x_mono = mono
+            apply_window(x_mono, win, xw)
+            cx = fft()
+            magnitude_smooth(cx, spec, max(0.0, smoothing), 1.0 / max(1.0, float(fft_size) / 2.0))
+
+            slot["td"] = _copy_into(slot["td"], x_td)
+            slot["spec"] = _copy_into(slot["spec"], spec)
+            slot["corr"] = corr
 
             with self._lock:
                 self.frame_id += 1
                 self.ts = time.time()
-                self.time_domain = x_td.astype(np.float32, copy=True)
-                self.spectrum = sm.astype(np.float32, copy=True)
+                slot["frame_id"] = self.frame_id
+                slot["ts"] = self.ts
+                self.time_domain = slot["td"]
+                self.spectrum = slot["spec"]
                 self.rms = rms
                 self.peak = peak
                 self.corr = corr
+                self._latest_idx = 1 - self._latest_idx
 
-            target_dt = 1.0 / max(10, fps_cap)
-            dt = time.time() - t0
+            if self.state is not None and self.state.ws_client_count() == 0:
+                target_dt = 1.0 / IDLE_FPS
+            else:
+                target_dt = 1.0 / max(10, fps_cap)
+            dt = time.perf_counter() - t0
             delay = target_dt - dt
             if delay > 0:
                 time.sleep(delay)
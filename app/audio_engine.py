@@ -8,6 +8,8 @@ from typing import Optional, List
 import numpy as np
 import sounddevice as sd
 
+from .dsp import downmix_mono
+
 
 @dataclass
 class DeviceInfo:
@@ -39,13 +41,16 @@ def list_input_devices() -> List[DeviceInfo]:
 
 
 class RingBuffer:
-    def __init__(self, *, seconds: float, samplerate: int, channels: int) -> None:
+    def __init__(self, *, seconds: float, samplerate: int, channels: int, max_view: int = 16384) -> None:
         self.samplerate = int(samplerate)
         self.channels = int(channels)
         self.size = int(max(1, seconds * self.samplerate))
-        self._buf = np.zeros((self.size, self.channels), dtype=np.float32)
+        # The first `_guard` frames are mirrored after the ring so wrapped reads stay contiguous.
+        self._guard = int(max(1, min(self.size, max_view)))
+        self._buf = np.zeros((self.size + self._guard, self.channels), dtype=np.float32)
+        self._mix = np.empty(0, dtype=np.float32)
+        # Lock-free SPSC: samples are written first, `_write` is published last.
         self._write = 0
-        self._lock = threading.RLock()
 
     def write(self, data: np.ndarray) -> None:
         if data.ndim == 1:
@@ -56,38 +61,44 @@ class RingBuffer:
 
         if data.shape[1] != self.channels:
             if self.channels == 1:
-                data = np.mean(data, axis=1, keepdims=True).astype(np.float32, copy=False)
+                if self._mix.shape[0] < frames:
+                    self._mix = np.empty(frames, dtype=np.float32)
+                mixed = self._mix[:frames]
+                downmix_mono(data, mixed)
+                data = mixed[:, None]
             else:
                 if data.shape[1] == 1:
-                    data = np.repeat(data, 2, axis=1).astype(np.float32, copy=False)
+                    data = np.repeat(data, 2, axis=1)
                 else:
-                    data = data[:, :self.channels].astype(np.float32, copy=False)
-
-        with self._lock:
-            n = frames
-            w = self._write
-            if n >= self.size:
-                data = data[-self.size:]
-                n = self.size
-            end = w + n
-            if end <= self.size:
-                self._buf[w:end] = data[:n]
-            else:
-                first = self.size - w
-                self._buf[w:] = data[:first]
-                self._buf[:end - self.size] = data[first:n]
-            self._write = (w + n) % self.size
+                    data = data[:, :self.channels]
+
+        n = frames
+        w = self._write
+        if n >= self.size:
+            data = data[-self.size:]
+            n = self.size
+        data = data[:n]
+        end = w + n
+        if end <= self.size:
+            self._buf[w:end] = data
+            if w < self._guard:
+                m = min(end, self._guard)
+                self._buf[w + self.size:m + self.size] = data[:m - w]
+        else:
+            first = self.size - w
+            g = min(end - self.size, self._guard)
+            self._buf[w:self.size + g] = data[:first + g]
+            self._buf[:end - self.size] = data[first:]
+        self._write = end % self.size
 
     def read_latest(self, n_samples: int) -> np.ndarray:
+        # Returns a view that stays valid until the writer laps it.
         n = int(max(1, min(self.size, n_samples)))
-        with self._lock:
-            w = self._write
-            start = (w - n) % self.size
-            if start < w:
-                out = self._buf[start:w].copy()
-            else:
-                out = np.vstack((self._buf[start:].copy(), self._buf[:w].copy()))
-        return out
+        w = self._write
+        start = (w - n) % self.size
+        if start + n <= self.size + self._guard:
+            return self._buf[start:start + n]
+        return np.concatenate((self._buf[start:self.size], self._buf[:w]))
 
 
 class AudioEngine:
@@ -179,8 +190,7 @@ class AudioEngine:
                 if self._stop.is_set():
                     raise sd.CallbackStop()
                 try:
-                    data = np.asarray(indata, dtype=np.float32)
-                    self.ring.write(data)
+                    self.ring.write(indata)
                 except Exception:
                     pass
 
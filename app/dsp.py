@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import math
+
+import numpy as np
+
+try:
+    from numba import njit
+except Exception:
+    njit = None
+
+
+if njit is not None:
+    @njit(cache=True, fastmath=True)
+    def apply_window(x: np.ndarray, win: np.ndarray, out: np.ndarray) -> None:
+        for i in range(out.shape[0]):
+            out[i] = x[i] * win[i]
+
+    @njit(cache=True, fastmath=True)
+    def magnitude_smooth(cx: np.ndarray, acc: np.ndarray, smoothing: float, scale: float) -> None:
+        a = smoothing
+        b = (1.0 - smoothing) * scale
+        for k in range(acc.shape[0]):
+            re = cx[k].real
+            im = cx[k].imag
+            acc[k] = a * acc[k] + b * math.sqrt(re * re + im * im)
+
+    @njit(cache=True, fastmath=True)
+    def downmix_mono(src: np.ndarray, dst: np.ndarray) -> None:
+        n_ch = src.shape[1]
+        inv = 1.0 / n_ch
+        for i in range(src.shape[0]):
+            acc = 0.0
+            for c in range(n_ch):
+                acc += src[i, c]
+            dst[i] = acc * inv
+
+else:
+    _mag_scratch = np.empty(0, dtype=np.float32)
+
+    def apply_window(x: np.ndarray, win: np.ndarray, out: np.ndarray) -> None:
+        np.multiply(x, win, out=out)
+
+    def magnitude_smooth(cx: np.ndarray, acc: np.ndarray, smoothing: float, scale: float) -> None:
+        global _mag_scratch
+        if _mag_scratch.shape != acc.shape:
+            _mag_scratch = np.empty(acc.shape, dtype=np.float32)
+        s = _mag_scratch
+        np.abs(cx, out=s)
+        s *= (1.0 - smoothing) * scale
+        acc *= smoothing
+        acc += s
+
+    def downmix_mono(src: np.ndarray, dst: np.ndarray) -> None:
+        np.sum(src, axis=1, dtype=np.float32, out=dst)
+        dst *= 1.0 / src.shape[1]
@@ -42,7 +42,7 @@ def main() -> None:
     )
     audio.start()
 
-    analyzer = Analyzer(audio)
+    analyzer = Analyzer(audio, state)
     analyzer.configure(
         samplerate=cfg.samplerate,
         channels=cfg.channels,
@@ -65,7 +65,9 @@ def main() -> None:
 
             try:
                 fid, ts, td, spec, rms, peak, corr = analyzer.get_latest()
-                state.update_metrics(frame_id=fid, ts=ts, rms=rms, peak=peak, corr=corr)
+                rms, peak = rms.tolist(), peak.tolist()
+                if analyzer.frame_intact(fid):
+                    state.update_metrics(frame_id=fid, ts=ts, rms=rms, peak=peak, corr=corr)
             except Exception:
                 pass
 
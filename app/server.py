@@ -6,9 +6,10 @@ import threading
 from pathlib import Path
 from typing import Any, Dict, Optional
 
+import numpy as np
 import uvicorn
 from fastapi import FastAPI, WebSocket
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 from starlette.websockets import WebSocketDisconnect
 
@@ -31,6 +32,12 @@ VISUALIZERS = [
     {"id": "membrane_vortex", "name": "Neon Membrane Vortex (WebGL2)", "renderer": "webgl"},
     {"id": "milkdrop", "name": "Milkdrop-ish Warp Reactor (WebGL2)", "renderer": "webgl"},
 ]
+
+# AVF1 header `format` field.
+FRAME_F32 = 0  # time domain + spectrum as float32
+FRAME_Q16 = 1  # time domain as int16 PCM, spectrum as unorm16 scaled by a per-frame spec_scale
+
+_AVF1_HEADER = struct.Struct("<4sIdHHHH")
 
 
 def _static_dir() -> Path:
@@ -39,10 +46,100 @@ def _static_dir() -> Path:
     return root / "static"
 
 
+class _FrameEncoder:
+    def __init__(self) -> None:
+        self._buf = bytearray(0)
+        self._scratch = np.empty(0, dtype=np.float32)
+
+    def encode(self, frame_id: int, ts: float, td: np.ndarray, spec: np.ndarray,
+               rms: np.ndarray, peak: np.ndarray, corr: Optional[float]) -> bytes:
+        ch = int(td.shape[1])
+        td_len = int(td.shape[0])
+        sp_len = int(spec.shape[0])
+        td_count = td_len * ch
+
+        metrics_off = _AVF1_HEADER.size
+        td_off = metrics_off + (2 * ch + 2) * 4
+        sp_off = td_off + td_count * 2
+        total = sp_off + sp_len * 2
+        if len(self._buf) < total:
+            self._buf = bytearray(total)
+        if self._scratch.shape[0] < max(td_count, sp_len):
+            self._scratch = np.empty(max(td_count, sp_len), dtype=np.float32)
+        buf = self._buf
+
+        spec_peak = float(spec.max()) if sp_len else 0.0
+        spec_scale = spec_peak if spec_peak > 1e-12 else 1.0
+
+        _AVF1_HEADER.pack_into(buf, 0, b"AVF1", frame_id, float(ts), ch, td_len, sp_len, FRAME_Q16)
+        metrics = np.frombuffer(buf, dtype="<f4", count=2 * ch + 2, offset=metrics_off)
+        metrics[:2 * ch] = 0.0
+        metrics[:min(ch, rms.shape[0])] = rms[:ch]
+        metrics[ch:ch + min(ch, peak.shape[0])] = peak[:ch]
+        metrics[2 * ch] = corr if corr is not None else float("nan")
+        metrics[2 * ch + 1] = spec_scale
+
+        tmp = self._scratch[:td_count]
+        np.multiply(td.reshape(-1), 32767.0, out=tmp)
+        np.rint(tmp, out=tmp)
+        np.clip(tmp, -32768, 32767, out=tmp)
+        np.copyto(np.frombuffer(buf, dtype="<i2", count=td_count, offset=td_off), tmp, casting="unsafe")
+
+        tmp = self._scratch[:sp_len]
+        np.multiply(spec, 65535.0 / spec_scale, out=tmp)
+        np.rint(tmp, out=tmp)
+        np.clip(tmp, 0, 65535, out=tmp)
+        np.copyto(np.frombuffer(buf, dtype="<u2", count=sp_len, offset=sp_off), tmp, casting="unsafe")
+
+        # Copy out: the transport may still hold the bytes after send returns.
+        return bytes(memoryview(buf)[:total])
+
+
+class _AudioBroadcaster:
+    def __init__(self, cfg: AppConfig, analyzer: Analyzer) -> None:
+        self._cfg = cfg
+        self._analyzer = analyzer
+        self._encoder = _FrameEncoder()
+        self._queues: set[asyncio.Queue] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    def register(self) -> asyncio.Queue:
+        q: asyncio.Queue = asyncio.Queue(maxsize=1)
+        self._queues.add(q)
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        return q
+
+    def unregister(self, q: asyncio.Queue) -> None:
+        self._queues.discard(q)
+
+    async def _run(self) -> None:
+        last_sent = -1
+        while self._queues:
+            if self._analyzer.latest_frame_id() == last_sent:
+                fps = max(10, int(getattr(self._cfg, "fps_cap", 60)))
+                await asyncio.sleep(max(0.001, 1.0 / (fps * 4.0)))
+                continue
+            try:
+                frame_id, ts, td, spec, rms, peak, corr = self._analyzer.get_latest()
+                last_sent = frame_id
+                data = self._encoder.encode(frame_id, ts, td, spec, rms, peak, corr)
+            except Exception:
+                await asyncio.sleep(0.05)
+                continue
+            if not self._analyzer.frame_intact(frame_id):
+                continue
+            for q in list(self._queues):
+                if q.full():
+                    q.get_nowait()
+                q.put_nowait(data)
+
+
 def create_app(cfg: AppConfig, state: StateStore, audio: AudioEngine, analyzer: Analyzer) -> FastAPI:
     static_dir = _static_dir()
-    app = FastAPI()
+    app = FastAPI(default_response_class=ORJSONResponse)
     app.mount("/static", StaticFiles(directory=str(static_dir)), name="static")
+    broadcaster = _AudioBroadcaster(cfg, analyzer)
 
     @app.get("/")
     def index():
@@ -58,12 +155,12 @@ def create_app(cfg: AppConfig, state: StateStore, audio: AudioEngine, analyzer:
 
     @app.get("/api/visualizers")
     def api_visualizers():
-        return JSONResponse(VISUALIZERS)
+        return ORJSONResponse(VISUALIZERS)
 
     @app.get("/api/devices")
     def api_devices():
         devs = list_input_devices()
-        return JSONResponse([{
+        return ORJSONResponse([{
             "id": d.id,
             "name": d.name,
             "hostapi": d.hostapi,
@@ -74,7 +171,7 @@ def create_app(cfg: AppConfig, state: StateStore, audio: AudioEngine, analyzer:
     @app.get("/api/state")
     def api_state():
         s = state.snapshot()
-        return JSONResponse({
+        return ORJSONResponse({
             "status": s.status,
             "last_error": s.last_error,
             "selected_device_id": s.selected_device_id,
@@ -117,7 +214,7 @@ def create_app(cfg: AppConfig, state: StateStore, audio: AudioEngine, analyzer:
         audio.configure(device_id=cfg.selected_device_id, device_name=cfg.selected_device_name,
                         samplerate=cfg.samplerate, channels=cfg.channels)
         audio.restart()
-        return JSONResponse({"ok": True})
+        return ORJSONResponse({"ok": True})
 
     @app.post("/api/visualizer")
     async def api_set_visualizer(payload: Dict[str, Any]):
@@ -125,7 +222,7 @@ def create_app(cfg: AppConfig, state: StateStore, audio: AudioEngine, analyzer:
         cfg.visualizer_name = vid
         save_config(cfg)
         state.update(visualizer_name=cfg.visualizer_name)
-        return JSONResponse({"ok": True})
+        return ORJSONResponse({"ok": True})
 
     @app.post("/api/options")
     async def api_set_options(payload: Dict[str, Any]):
@@ -181,42 +278,23 @@ def create_app(cfg: AppConfig, state: StateStore, audio: AudioEngine, analyzer:
                             samplerate=cfg.samplerate, channels=cfg.channels)
             audio.restart()
 
-        return JSONResponse({"ok": True})
+        return ORJSONResponse({"ok": True})
 
     @app.websocket("/ws/audio")
     async def ws_audio(ws: WebSocket):
         await ws.accept()
         snap = state.snapshot()
         state.update(ws_clients=snap.ws_clients + 1)
+        queue = broadcaster.register()
         try:
-            last_sent = -1
             while True:
-                frame_id, ts, td, spec, rms, peak, corr = analyzer.get_latest()
-                if frame_id == last_sent:
-                    fps = max(10, int(getattr(cfg, "fps_cap", 60)))
-                    await asyncio.sleep(max(0.001, 1.0 / (fps * 4.0)))
-                    continue
-                last_sent = frame_id
-                ch = int(td.shape[1])
-                td_len = int(td.shape[0])
-                sp_len = int(spec.shape[0])
-
-                header = struct.pack("<4sIdHHHH", b"AVF1", frame_id, float(ts), ch, td_len, sp_len, 0)
-                rms_arr = (rms + [0.0, 0.0])[:ch]
-                peak_arr = (peak + [0.0, 0.0])[:ch]
-                corr_val = corr if corr is not None else float("nan")
-                metrics = struct.pack("<" + ("f"*ch) + ("f"*ch) + "f",
-                                      *[float(x) for x in rms_arr],
-                                      *[float(x) for x in peak_arr],
-                                      float(corr_val))
-                td_bytes = td.astype("float32", copy=False).tobytes(order="C")
-                spec_bytes = spec.astype("float32", copy=False).tobytes(order="C")
-                await ws.send_bytes(header + metrics + td_bytes + spec_bytes)
+                await ws.send_bytes(await queue.get())
         except WebSocketDisconnect:
             pass
         except Exception:
             pass
         finally:
+            broadcaster.unregister(queue)
             snap2 = state.snapshot()
             state.update(ws_clients=max(0, snap2.ws_clients - 1))
 
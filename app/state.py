@@ -3,7 +3,7 @@ from __future__ import annotations
 import threading
 import time
 from dataclasses import dataclass, field
-from typing import Any, Optional
+from typing import Any, Optional, Sequence
 
 
 @dataclass
@@ -77,12 +77,16 @@ class StateStore:
                 if hasattr(self._state, k):
                     setattr(self._state, k, v)
 
-    def update_metrics(self, *, frame_id: int, ts: float, rms: list[float], peak: list[float], corr: Optional[float]) -> None:
+    def ws_client_count(self) -> int:
+        with self._lock:
+            return self._state.ws_clients
+
+    def update_metrics(self, *, frame_id: int, ts: float, rms: Sequence[float], peak: Sequence[float], corr: Optional[float]) -> None:
         with self._lock:
             self._state.metrics.frame_id = int(frame_id)
             self._state.metrics.ts = float(ts)
-            self._state.metrics.rms = list(rms)
-            self._state.metrics.peak = list(peak)
+            self._state.metrics.rms = [float(x) for x in rms]
+            self._state.metrics.peak = [float(x) for x in peak]
             self._state.metrics.corr = corr
 
     def set_error(self, msg: str) -> None:
@@ -1,11 +1,19 @@
 from __future__ import annotations
 
+import concurrent.futures
+import functools
+import io
+import os
+import sys
+import tempfile
 import threading
+import time
 import webbrowser
 from typing import Callable
 
+import numpy as np
 import pystray
-from PIL import Image, ImageDraw
+from PIL import Image
 
 try:
     import tkinter as tk
@@ -19,17 +27,111 @@ from .state import StateStore
 from .audio_engine import list_input_devices, AudioEngine
 from .server import VISUALIZERS
 
+DEVICE_CACHE_TTL = 5.0
 
-def _make_icon() -> Image.Image:
-    img = Image.new("RGBA", (64, 64), (0, 0, 0, 0))
-    d = ImageDraw.Draw(img)
-    d.rounded_rectangle((8, 8, 56, 56), radius=12, fill=(20, 20, 20, 255))
-    bars = [16, 28, 40, 32, 48, 24, 36]
+
+def _rounded_mask(w: int, h: int, r: int) -> np.ndarray:
+    dx = np.maximum(np.maximum(r - 0.5 - np.arange(w), np.arange(w) + 0.5 - (w - r)), 0.0)
+    dy = np.maximum(np.maximum(r - 0.5 - np.arange(h), np.arange(h) + 0.5 - (h - r)), 0.0)
+    return dx[None, :] ** 2 + dy[:, None] ** 2 <= r * r
+
+
+_ICON_BG = np.zeros((64, 64, 4), dtype=np.uint8)
+_ICON_BG[8:57, 8:57][_rounded_mask(49, 49, 12)] = (20, 20, 20, 255)
+
+
+def _render_icon(bars) -> Image.Image:
+    arr = _ICON_BG.copy()
     x = 14
     for h in bars:
-        d.rounded_rectangle((x, 52 - h, x + 4, 52), radius=2, fill=(180, 220, 255, 255))
+        arr[52 - h:53, x:x + 5][_rounded_mask(5, h + 1, 2)] = (180, 220, 255, 255)
         x += 6
-    return img
+    return Image.frombuffer("RGBA", (64, 64), arr.tobytes(), "raw", "RGBA", 0, 1)
+
+
+@functools.lru_cache(maxsize=1)
+def _make_icon() -> Image.Image:
+    return _render_icon((16, 28, 40, 32, 48, 24, 36))
+
+
+class _TrayIcon(pystray.Icon):
+    def __init__(self, *args, **kwargs):
+        self._menu_lock = threading.RLock()
+        super().__init__(*args, **kwargs)
+
+    def update_menu(self):
+        with self._menu_lock:
+            super().update_menu()
+
+
+@functools.lru_cache(maxsize=1)
+def _icon_class() -> type:
+    if sys.platform != "win32":
+        return _TrayIcon
+    try:
+        from pystray._util import win32
+    except Exception:
+        return _TrayIcon
+
+    wm_update_menu = win32.WM_USER + 20
+
+    class _Win32Icon(_TrayIcon):
+        _ico_image = None
+        _ico_path = None
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self._menu_posted = threading.Event()
+            self._message_handlers[wm_update_menu] = self._on_update_menu
+
+        def update_menu(self):
+            # The HMENU may only be rebuilt on the icon's message-loop thread.
+            hwnd = self._hwnd
+            if hwnd and threading.current_thread() is not getattr(self, "_thread", None):
+                if not self._menu_posted.is_set():
+                    self._menu_posted.set()
+                    win32.PostMessage(hwnd, wm_update_menu, 0, 0)
+                return
+            super().update_menu()
+
+        def _on_update_menu(self, wparam, lparam):
+            self._menu_posted.clear()
+            _TrayIcon.update_menu(self)
+
+        def _assert_icon_handle(self):
+            if self._icon_handle:
+                return
+            if self._ico_image is not self.icon or self._ico_path is None:
+                buf = io.BytesIO()
+                self.icon.save(buf, format="ICO")
+                self._drop_ico()
+                fd, path = tempfile.mkstemp(".ico")
+                with os.fdopen(fd, "wb") as f:
+                    f.write(buf.getvalue())
+                self._ico_image, self._ico_path = self.icon, path
+            self._icon_handle = win32.LoadImage(
+                None,
+                self._ico_path,
+                win32.IMAGE_ICON,
+                0,
+                0,
+                win32.LR_DEFAULTSIZE | win32.LR_LOADFROMFILE)
+
+        def _drop_ico(self):
+            path, self._ico_path, self._ico_image = self._ico_path, None, None
+            if path:
+                try:
+                    os.remove(path)
+                except Exception:
+                    pass
+
+        def stop(self):
+            try:
+                super().stop()
+            finally:
+                self._drop_ico()
+
+    return _Win32Icon
 
 
 class TrayApp:
@@ -38,19 +140,28 @@ class TrayApp:
         self.state = state
         self.audio = audio
         self.on_quit = on_quit
-        self._tuning_lock = threading.Lock()
-        self._tuning_open = False
+        self._tuning_open = threading.Event()
         self._tuning_root = None
+        self._devs = None
+        self._devs_ts = 0.0
+        self._callbacks = {}
+        self._label_cache = {}
+        self._dev_items = None
+        self._viz_items = None
+        try:
+            self._browser = webbrowser.get()
+        except Exception:
+            self._browser = None
+        self._audio_exec = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="TrayAudio")
 
-        self.icon = pystray.Icon("ObsVizHost", _make_icon(), "ObsVizHost")
-        self._rebuild_menu()
+        self.icon = _icon_class()("ObsVizHost", _make_icon(), "ObsVizHost", menu=self._build_menu())
 
 
-    def _rebuild_menu(self):
-        viz_menu = pystray.Menu(*self._visualizer_items())
-        dev_menu = pystray.Menu(*self._device_items())
+    def _build_menu(self):
+        viz_menu = pystray.Menu(self._visualizer_items)
+        dev_menu = pystray.Menu(self._device_items)
         tuning_info = pystray.MenuItem(
-            f"Gain: {self.cfg.gain:.2f}x | Smooth: {self.cfg.visual_smoothing:.2f}",
+            lambda item: f"Gain: {self.cfg.gain:.2f}x | Smooth: {self.cfg.visual_smoothing:.2f}",
             None,
             enabled=False,
         )
@@ -58,7 +169,7 @@ class TrayApp:
             tuning_item = pystray.MenuItem("Audio Tuning (Tk unavailable)", None, enabled=False)
         else:
             tuning_item = pystray.MenuItem("Audio Tuning...", self._open_tuning)
-        self.icon.menu = pystray.Menu(
+        return pystray.Menu(
             pystray.MenuItem("Open UI", self._open_ui),
             tuning_info,
             tuning_item,
@@ -71,36 +182,66 @@ class TrayApp:
             pystray.MenuItem("Quit", self._quit),
         )
 
+    def _request_menu_update(self):
+        try:
+            self.icon.update_menu()
+        except Exception:
+            pass
+
     def _refresh_devices(self, icon, item):
-        self._rebuild_menu()
+        self._devs_ts = 0.0
+        self._label_cache.clear()
+        self._input_devices()
+
+    def _input_devices(self):
+        now = time.monotonic()
+        if self._devs is None or now - self._devs_ts >= DEVICE_CACHE_TTL:
+            devs = list_input_devices()
+            if devs != self._devs:
+                self._devs = devs
+            self._devs_ts = now
+        return self._devs
 
     def _open_ui(self, icon, item):
-        webbrowser.open(f"http://127.0.0.1:{self.cfg.port}/")
+        url = f"http://127.0.0.1:{self.cfg.port}/"
+        try:
+            if self._browser is not None and self._browser.open(url):
+                return
+        except Exception:
+            pass
+        webbrowser.open(url)
 
-    def _restart_audio(self, icon, item):
+    def _reconfigure_and_restart(self):
         self.audio.configure(device_id=self.cfg.selected_device_id, device_name=self.cfg.selected_device_name,
                              samplerate=self.cfg.samplerate, channels=self.cfg.channels)
         self.audio.restart()
 
+    def _restart_audio(self, icon, item):
+        try:
+            self._audio_exec.submit(self._reconfigure_and_restart)
+        except RuntimeError:
+            pass
+
     def _open_tuning(self, icon, item):
         if tk is None:
             return
-        with self._tuning_lock:
-            if self._tuning_open:
-                root = self._tuning_root
-                if root is not None:
-                    try:
-                        root.after(0, self._focus_tuning)
-                    except Exception:
-                        pass
-                return
-            self._tuning_open = True
+        if self._tuning_open.is_set():
+            root = self._tuning_root
+            if root is not None:
+                try:
+                    root.after(0, self._focus_tuning)
+                except Exception:
+                    pass
+            return
+        self._tuning_open.set()
         threading.Thread(target=self._run_tuning_window, name="AudioTuning", daemon=True).start()
 
     def _focus_tuning(self):
         if not self._tuning_root:
             return
         try:
+            if self._tuning_root.state() == "normal" and self._tuning_root.focus_displayof() is not None:
+                return
             self._tuning_root.deiconify()
             self._tuning_root.lift()
             self._tuning_root.attributes("-topmost", True)
@@ -109,17 +250,18 @@ class TrayApp:
             pass
 
     def _run_tuning_window(self):
-        if tk is None or ttk is None:
-            with self._tuning_lock:
-                self._tuning_open = False
-            return
+        try:
+            if tk is not None and ttk is not None:
+                self._tuning_window()
+        finally:
+            self._tuning_root = None
+            self._tuning_open.clear()
 
+    def _tuning_window(self):
         root = tk.Tk()
         root.title("Audio Tuning")
         root.resizable(False, False)
-
-        with self._tuning_lock:
-            self._tuning_root = root
+        self._tuning_root = root
 
         frame = ttk.Frame(root, padding=12)
         frame.grid(sticky="nsew")
@@ -129,78 +271,87 @@ class TrayApp:
         gain_var = tk.DoubleVar(value=self.cfg.gain)
         smooth_var = tk.DoubleVar(value=self.cfg.visual_smoothing)
 
+        gain_str = tk.StringVar(value=f"{gain_var.get():.2f}x")
+        smooth_str = tk.StringVar(value=f"{smooth_var.get():.2f}")
+        gain_var.trace_add("write", lambda *_: gain_str.set(f"{gain_var.get():.2f}x"))
+        smooth_var.trace_add("write", lambda *_: smooth_str.set(f"{smooth_var.get():.2f}"))
+
         ttk.Label(frame, text="Gain").grid(row=0, column=0, sticky="w")
-        gain_val = ttk.Label(frame, text=f"{gain_var.get():.2f}x")
-        gain_val.grid(row=0, column=1, sticky="e")
+        ttk.Label(frame, textvariable=gain_str).grid(row=0, column=1, sticky="e")
 
         ttk.Label(frame, text="Smoothing").grid(row=2, column=0, sticky="w", pady=(8, 0))
-        smooth_val = ttk.Label(frame, text=f"{smooth_var.get():.2f}")
-        smooth_val.grid(row=2, column=1, sticky="e", pady=(8, 0))
+        ttk.Label(frame, textvariable=smooth_str).grid(row=2, column=1, sticky="e", pady=(8, 0))
 
-        pending = {"id": None}
+        pending = {"id": None, "state": None, "persist": None}
 
-        def update_labels() -> None:
-            gain_val.config(text=f"{gain_var.get():.2f}x")
-            smooth_val.config(text=f"{smooth_var.get():.2f}")
+        def cancel(key: str) -> None:
+            if pending[key] is not None:
+                try:
+                    root.after_cancel(pending[key])
+                except Exception:
+                    pass
+                pending[key] = None
 
-        def apply_values() -> None:
+        def apply_in_memory() -> None:
             pending["id"] = None
-            self.cfg.gain = float(gain_var.get())
-            self.cfg.visual_smoothing = float(smooth_var.get())
+            self.cfg.gain = round(float(gain_var.get()), 2)
+            self.cfg.visual_smoothing = round(float(smooth_var.get()), 2)
             self.cfg.clamp()
-            save_config(self.cfg)
             gain_var.set(self.cfg.gain)
             smooth_var.set(self.cfg.visual_smoothing)
-            update_labels()
+
+        def push_state() -> None:
+            pending["state"] = None
             self.state.update(gain=self.cfg.gain, visual_smoothing=self.cfg.visual_smoothing)
-            self._rebuild_menu()
-            try:
-                self.icon.update_menu()
-            except Exception:
-                pass
+
+        def persist() -> None:
+            pending["persist"] = None
+            save_config(self.cfg)
+            self._request_menu_update()
 
         def schedule_apply(_value=None) -> None:
-            update_labels()
-            if pending["id"] is not None:
-                try:
-                    root.after_cancel(pending["id"])
-                except Exception:
-                    pass
-            pending["id"] = root.after(120, apply_values)
+            cancel("id")
+            pending["id"] = root.after(120, apply_in_memory)
+            cancel("state")
+            pending["state"] = root.after(300, push_state)
+            cancel("persist")
+            pending["persist"] = root.after(500, persist)
 
-        gain_scale = tk.Scale(
+        def commit_now(_event=None) -> None:
+            cancel("id")
+            cancel("state")
+            cancel("persist")
+            apply_in_memory()
+            push_state()
+            persist()
+
+        gain_scale = ttk.Scale(
             frame,
             from_=0.2,
             to=4.0,
-            resolution=0.01,
             orient="horizontal",
-            showvalue=False,
             variable=gain_var,
             length=260,
             command=schedule_apply,
         )
         gain_scale.grid(row=1, column=0, columnspan=2, sticky="ew")
 
-        smooth_scale = tk.Scale(
+        smooth_scale = ttk.Scale(
             frame,
             from_=0.0,
             to=0.95,
-            resolution=0.01,
             orient="horizontal",
-            showvalue=False,
             variable=smooth_var,
             length=260,
             command=schedule_apply,
         )
         smooth_scale.grid(row=3, column=0, columnspan=2, sticky="ew")
 
+        gain_scale.bind("<ButtonRelease-1>", commit_now, add="+")
+        smooth_scale.bind("<ButtonRelease-1>", commit_now, add="+")
+
         def close_window() -> None:
-            if pending["id"] is not None:
-                try:
-                    root.after_cancel(pending["id"])
-                except Exception:
-                    pass
-            apply_values()
+            commit_now()
             root.destroy()
 
         btn = ttk.Button(frame, text="Close", command=close_window)
@@ -210,35 +361,37 @@ class TrayApp:
         self._focus_tuning()
         root.mainloop()
 
-        with self._tuning_lock:
-            self._tuning_open = False
-            self._tuning_root = None
-
     def _set_visualizer(self, vid: str):
         self.cfg.visualizer_name = vid
         save_config(self.cfg)
         self.state.update(visualizer_name=self.cfg.visualizer_name)
 
-    def _visualizer_items(self):
-        def _make_handler(vid: str):
-            def _handler(icon, item):
-                self._set_visualizer(vid)
-            return _handler
+    def _callback_pair(self, key, on_click, is_checked, *args):
+        pair = self._callbacks.get(key)
+        if pair is None:
+            pair = (functools.partial(on_click, *args), functools.partial(is_checked, *args))
+            self._callbacks[key] = pair
+        return pair
 
-        def _make_checked(vid: str):
-            def _checked(item):
-                return self.cfg.visualizer_name == vid
-            return _checked
+    def _on_viz(self, vid: str, icon, item):
+        self._set_visualizer(vid)
 
-        items = []
+    def _viz_checked(self, vid: str, item) -> bool:
+        return self.cfg.visualizer_name == vid
+
+    def _visualizer_items(self):
+        if self._viz_items is not None:
+            return self._viz_items
+        items = self._viz_items = []
         for v in VISUALIZERS:
             vid = v["id"]
             name = v["name"]
+            on_click, checked = self._callback_pair(("viz", vid), self._on_viz, self._viz_checked, vid)
 
             items.append(pystray.MenuItem(
                 name,
-                _make_handler(vid),
-                checked=_make_checked(vid),
+                on_click,
+                checked=checked,
                 radio=True,
             ))
         return items
@@ -248,39 +401,46 @@ class TrayApp:
         self.cfg.selected_device_name = dev_name
         save_config(self.cfg)
         self.state.update(selected_device_id=self.cfg.selected_device_id, selected_device_name=self.cfg.selected_device_name)
-        self.audio.configure(device_id=self.cfg.selected_device_id, device_name=self.cfg.selected_device_name,
-                             samplerate=self.cfg.samplerate, channels=self.cfg.channels)
-        self.audio.restart()
+        try:
+            self._audio_exec.submit(self._reconfigure_and_restart)
+        except RuntimeError:
+            pass
 
-    def _device_items(self):
-        def _make_handler(dev_id: int, dev_name: str):
-            def _handler(icon, item):
-                self._set_device(dev_id, dev_name)
-            return _handler
+    def _on_device(self, dev_id: int, dev_name: str, icon, item):
+        self._set_device(dev_id, dev_name)
 
-        def _make_checked(dev_id: int):
-            def _checked(item):
-                return self.cfg.selected_device_id == dev_id
-            return _checked
+    def _device_checked(self, dev_id: int, dev_name: str, item) -> bool:
+        return self.cfg.selected_device_id == dev_id
 
-        devs = list_input_devices()
+    def _device_items(self):
+        devs = self._input_devices()
+        if self._dev_items is not None and self._dev_items[0] is devs:
+            return self._dev_items[1]
         items = []
+        self._dev_items = (devs, items)
         if not devs:
             items.append(pystray.MenuItem("No input devices found", None, enabled=False))
             return items
 
         for d in devs:
-            label = f"{d.name} ({d.hostapi})"
+            key = (d.id, d.name, d.hostapi)
+            label = self._label_cache.get(key)
+            if label is None:
+                label = self._label_cache[key] = f"{d.name} ({d.hostapi})"
+            on_click, checked = self._callback_pair(("dev", d.id, d.name), self._on_device, self._device_checked,
+                                                    d.id, d.name)
 
             items.append(pystray.MenuItem(
                 label,
-                _make_handler(d.id, d.name),
-                checked=_make_checked(d.id),
+                on_click,
+                checked=checked,
                 radio=True,
             ))
         return items
 
     def _quit(self, icon, item):
+        # Wait out a running restart so it can't reopen the stream after on_quit() stops it.
+        self._audio_exec.shutdown(wait=True, cancel_futures=True)
         try:
             self.icon.visible = False
         except Exception:
@@ -38,9 +38,13 @@ export function connectAudioWS({url, onFrame, onStatus}){
 }
 
 // AVF1 format:
-// header: magic(4) + u32 frame + f64 ts + u16 ch + u16 td_len + u16 sp_len + u16 reserved
-// metrics: rms[ch] + peak[ch] + corr float32 (NaN if none)
-// payload: time_domain float32 (td_len*ch) + spectrum float32 (sp_len)
+// header: magic(4) + u32 frame + f64 ts + u16 ch + u16 td_len + u16 sp_len + u16 format
+// metrics: rms[ch] + peak[ch] + corr float32 (NaN if none) [+ spec_scale float32 when format=1]
+// payload, format 0: time_domain float32 (td_len*ch) + spectrum float32 (sp_len)
+// payload, format 1: time_domain int16 PCM (td_len*ch) + spectrum unorm16 (sp_len), spectrum = q * spec_scale / 65535
+const FRAME_F32 = 0;
+const FRAME_Q16 = 1;
+
 function parseAVF1(buf){
   const dv = new DataView(buf);
   const magic = String.fromCharCode(dv.getUint8(0), dv.getUint8(1), dv.getUint8(2), dv.getUint8(3));
@@ -51,7 +55,7 @@ function parseAVF1(buf){
   const channels = dv.getUint16(off, true); off += 2;
   const tdLen = dv.getUint16(off, true); off += 2;
   const spLen = dv.getUint16(off, true); off += 2;
-  off += 2;
+  const format = dv.getUint16(off, true); off += 2;
 
   const rms = [];
   for(let i=0;i<channels;i++){ rms.push(dv.getFloat32(off, true)); off += 4; }
@@ -60,8 +64,23 @@ function parseAVF1(buf){
   const corr = dv.getFloat32(off, true); off += 4;
 
   const tdCount = tdLen * channels;
-  const timeDomain = new Float32Array(buf, off, tdCount); off += tdCount*4;
-  const spectrum = new Float32Array(buf, off, spLen); off += spLen*4;
+  let timeDomain, spectrum;
+  if(format === FRAME_Q16){
+    const specScale = dv.getFloat32(off, true); off += 4;
+    const tdQ = new Int16Array(buf, off, tdCount); off += tdCount*2;
+    const spQ = new Uint16Array(buf, off, spLen); off += spLen*2;
+    timeDomain = new Float32Array(tdCount);
+    const tdK = 1 / 32767;
+    for(let i=0;i<tdCount;i++) timeDomain[i] = tdQ[i] * tdK;
+    spectrum = new Float32Array(spLen);
+    const spK = specScale / 65535;
+    for(let i=0;i<spLen;i++) spectrum[i] = spQ[i] * spK;
+  }else if(format === FRAME_F32){
+    timeDomain = new Float32Array(buf, off, tdCount); off += tdCount*4;
+    spectrum = new Float32Array(buf, off, spLen); off += spLen*4;
+  }else{
+    throw new Error("unknown AVF1 format " + format);
+  }
 
   return {
     frameId, ts, channels,